@@ -39,6 +39,12 @@ def split_data(
     ----
         please split the data uniformly across data parallel groups and
         do not shuffle the index as we will shuffle them later
+
+        the splits are basic slices, so for np.ndarray inputs they are views of the original
+        arrays and no data is copied; array-likes such as h5py datasets or np.memmap arrays
+        only read the rows of the returned split. When data_num is not divisible by dp_size
+        the trailing data_num % dp_size samples are dropped so that every data parallel group
+        runs the same number of iterations
     """
 
     """TODO: Your code here"""
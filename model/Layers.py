@@ -1,3 +1,5 @@
+import copy
+
 import numpy as np
 from mpi4py import MPI
 from .memory_profiler import MemoryProfiler
@@ -22,6 +24,7 @@ class FCLayer(Layer):
         mp_size: int = 1,
         megatron_mp: bool = False,
         is_fc1: bool = True,
+        sequence_parallel: bool = False,
     ):
         """Defines a Fully-Connected (FC) Linear layer
 
@@ -41,6 +44,8 @@ class FCLayer(Layer):
         :type megatron_mp: bool, optional
         :param is_fc1: Whether this is the fc1 layer (True) or fc2 layer (False) in a MLP block. This info is useful only when megatron_mp==True, defaults to True
         :type is_fc1: bool, optional
+        :param sequence_parallel: Whether the Megatron-style fc2 layer returns only this node's batch shard of its output (Reduce_scatter instead of Allreduce), defaults to False
+        :type sequence_parallel: bool, optional
         """
         super().__init__(
             name=f"FCLayer--[{in_dim}, {out_dim}]-MP Size-[{mp_size}]-MegatronP:{megatron_mp}"
@@ -53,6 +58,11 @@ class FCLayer(Layer):
         self.mp_size = mp_size
         self.megatron_mp = megatron_mp
         self.is_fc1 = is_fc1
+        assert megatron_mp or not sequence_parallel, "sequence parallelism requires Megatron-style model parallelism"
+        # only the fc2 output is reduced across the model parallel group
+        self.sequence_parallel = sequence_parallel and not is_fc1
+        # rows of the batch held by this node when the last forward returned a shard, else None
+        self.shard_rows = None
         self.rank = comm.Get_rank()
         self.f_peak_memory_usage = MemoryProfiler()
         self.b_peak_memory_usage = MemoryProfiler()
@@ -75,6 +85,11 @@ class FCLayer(Layer):
             out_dim=self.out_dim,
         )
 
+        # the split communicators are shared by every layer, so take per-layer handles to keep
+        # the communication breakdown in log_stats separate for each layer
+        self.mp_comm = copy.copy(self.mp_comm)
+        self.dp_comm = copy.copy(self.dp_comm)
+
         # Initialize Weight and Bias
         self.x = None
         np.random.seed(self.rank % mp_size)
@@ -84,6 +99,9 @@ class FCLayer(Layer):
 
         self.grad_w = np.empty_like(self.w)
         self.grad_b = np.empty_like(self.b)
+        self.grad_request = None
+        # the request whose reduced gradients were last applied; self.grad_w/grad_b may view its buffer
+        self.applied_grad_request = None
 
         if self.megatron_mp:
             self.forward = self.megatron_forward
@@ -158,18 +176,36 @@ class FCLayer(Layer):
 
         self.x = x
         out = x @ self.w
-        out = out + np.broadcast_to(self.b, out.shape)
+        if self.is_fc1:
+            np.add(out, self.b, out=out)
 
         self.f_peak_memory_usage.add_var(x)
         self.f_peak_memory_usage.add_var(out)
         self.f_peak_memory_usage.add_var(self.w)
         self.f_peak_memory_usage.add_var(self.b)
 
-        if not self.is_fc1:
+        self.shard_rows = None
+        if self.sequence_parallel and out.shape[0] % self.mp_size == 0:
+            # the bias-add is done in place on the reduction buffer
+            out_ = megatron_scatter_forward_output(
+                out=out,
+                mp_comm=self.mp_comm,
+                mp_size=self.mp_size,
+                bias=self.b,
+            )
+            shard_size = out_.shape[0]
+            self.shard_rows = slice(self.mp_group_idx * shard_size, (self.mp_group_idx + 1) * shard_size)
+
+            out = out_
+
+            self.f_peak_memory_usage.add_var(out_)
+        elif not self.is_fc1:
+            # the bias-add is done in place on the reduction buffer
             out_ = megatron_collect_forward_output(
                 out=out,
                 mp_comm=self.mp_comm,
                 mp_size=self.mp_size,
+                bias=self.b,
             )
 
             out = out_
@@ -204,6 +240,8 @@ class FCLayer(Layer):
             self.b_peak_memory_usage.add_var(self.grad_b)
             self.b_peak_memory_usage.add_var(self.grad_w)
 
+            self.start_weight_grad_collection()
+
             if self.is_fc1:  ### for the first FC layer we don't need to return grad_x
                 self.b_peak_memory_usage.end()
                 return [None]
@@ -227,6 +265,8 @@ class FCLayer(Layer):
             self.b_peak_memory_usage.add_var(self.grad_b)
             self.b_peak_memory_usage.add_var(self.grad_w)
 
+            self.start_weight_grad_collection()
+
             if self.is_fc1:  ### for the first FC layer we don't need to return grad_x
                 self.b_peak_memory_usage.end()
                 return [None]
@@ -246,6 +286,14 @@ class FCLayer(Layer):
         self.b_peak_memory_usage.start()
         self.b_peak_memory_usage.add_var(output_grad)
 
+        if self.shard_rows is not None:
+            # the forward returned a batch shard, so its output_grad is a shard too
+            output_grad = megatron_gather_backward_output(
+                output_grad=output_grad,
+                mp_comm=self.mp_comm,
+                mp_size=self.mp_size,
+            )
+
         output_grad = megatron_collect_backward_output(
             output_grad=output_grad,
             mp_group_idx=self.mp_group_idx,
@@ -258,6 +306,8 @@ class FCLayer(Layer):
         self.b_peak_memory_usage.add_var(self.grad_b)
         self.b_peak_memory_usage.add_var(self.grad_w)
 
+        self.start_weight_grad_collection()
+
         if self.is_fc1:  ### for the first FC layer we don't need to return grad_x
             self.b_peak_memory_usage.end()
             return [None]
@@ -273,13 +323,36 @@ class FCLayer(Layer):
 
         return [grad_x]
 
-    def update_weight(self, lr):
-        grad_w, grad_b = collect_weight_grad(
+    def start_weight_grad_collection(self):
+        """Start reducing the local weight gradients across data parallel nodes so that the
+        communication overlaps with the backward pass of the preceding layers"""
+        if self.grad_request is not None:
+            # backward ran again before update_weight consumed the previous reduction: complete
+            # it so that neither its MPI request nor its buffer is leaked
+            self.grad_request.release()
+        if self.applied_grad_request is not None:
+            # self.grad_w/grad_b have been replaced by the new local gradients at this point
+            self.applied_grad_request.release()
+            self.applied_grad_request = None
+
+        self.grad_request = start_collect_weight_grad(
             grad_w=self.grad_w,
             grad_b=self.grad_b,
             dp_comm=self.dp_comm,
         )
 
+    def update_weight(self, lr):
+        if self.grad_request is not None:
+            grad_w, grad_b = self.grad_request.wait()
+            # keep the buffer checked out until the next backward replaces these gradients
+            self.applied_grad_request, self.grad_request = self.grad_request, None
+        else:
+            grad_w, grad_b = collect_weight_grad(
+                grad_w=self.grad_w,
+                grad_b=self.grad_b,
+                dp_comm=self.dp_comm,
+            )
+
         self.grad_w = grad_w
         self.grad_b = grad_b
 
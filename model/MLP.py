@@ -1,5 +1,8 @@
+import copy
+
 import numpy as np
 from .Layers import FCLayer, ReLULayer, CrossEntropyLossLayer
+from .backend import allreduce
 
 np.random.seed(1)
 
@@ -14,6 +17,7 @@ class MLPModel(object):
         feature_dim: int = 784,
         hidden_dim: int = 256,
         output_dim: int = 10,
+        sequence_parallel: bool = False,
     ):
         """Defines a MLP block
 
@@ -31,6 +35,8 @@ class MLPModel(object):
         :type hidden_dim: int, optional
         :param output_dim: The output dimension, defaults to 10
         :type output_dim: int, optional
+        :param sequence_parallel: Whether to compute the loss on batch shards after the Megatron-style fc2 layer, defaults to False
+        :type sequence_parallel: bool, optional
         """
         self.fc1 = FCLayer(
             comm=comm,
@@ -52,30 +58,54 @@ class MLPModel(object):
             mp_size=mp_size,
             megatron_mp=megatron_mp,
             is_fc1=False,
+            sequence_parallel=sequence_parallel,
         )
         self.cross_entropy_loss = CrossEntropyLossLayer()
         self.comm = comm
         self.rank = comm.Get_rank()
         self.mp_size = mp_size
         self.dp_size = dp_size
+        self.sequence_parallel = sequence_parallel
+        # a separate handle of fc2's model parallel group, so that reducing the logging metrics
+        # is not counted in fc2's communication breakdown
+        self.metrics_comm = copy.copy(self.fc2.mp_comm)
 
     def forward(self, x, y):
         """
 
         :param x: input images of shape (batch_size, feature_dim)
         :param y: labels of shape (batch_size, )
-        :return: loss
+        :return: loss, acc; with sequence parallelism these only cover this node's batch shard (see reduce_metrics)
         """
         y_one_hot = np.zeros((x.shape[0], 10))
         y_one_hot[np.arange(y.shape[0]), y] = 1
         x = self.fc1.forward(x)
         x = self.relu.forward(x)
         x = self.fc2.forward(x)
+        rows = self.fc2.shard_rows
+        if rows is not None:
+            # fc2 returned this node's batch shard, so the loss only covers those samples
+            y, y_one_hot = y[rows], y_one_hot[rows]
         predict = np.argmax(x, axis=1)
         acc = (y == predict).sum() / y.shape[0]
         loss = self.cross_entropy_loss.forward(x, y_one_hot)
         return loss, acc
 
+    def reduce_metrics(self, metrics):
+        """Turn per-node metrics returned by forward (or linear sums of them) into batch metrics
+
+        The shards have equal sizes, so a batch metric is the mean of the shard metrics over the
+        model parallel group (a batch fc2 did not shard has the same value on every node). Must
+        be called by every node of the group; it is a no-op without sequence parallelism.
+
+        :param metrics: list of metrics of this node
+        :return: np.array of the batch metrics
+        """
+        metrics = np.array(metrics, dtype=np.float64)
+        if not self.sequence_parallel:
+            return metrics
+        return allreduce(metrics, self.metrics_comm) / self.mp_size
+
     def backward(self):
         grad_x = self.cross_entropy_loss.backward()[0]
         grad_x = self.fc2.backward(output_grad=grad_x)[0]
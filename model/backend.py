@@ -0,0 +1,419 @@
+import numpy as np
+from mpi4py import MPI
+
+try:
+    import cupy
+    from cupy.cuda import nccl
+except ImportError:
+    cupy = None
+    nccl = None
+
+
+# MPI datatypes for the numpy dtypes exchanged by the collectives
+_MPI_DTYPE = {
+    np.dtype(np.float32): MPI.FLOAT,
+    np.dtype(np.float64): MPI.DOUBLE,
+    np.dtype(np.int32): MPI.INT,
+}
+
+
+def _typed(x: np.ndarray):
+    """Wrap an array into an explicit [buffer, datatype] spec so mpi4py takes the buffer path"""
+    mpi_dtype = _MPI_DTYPE.get(x.dtype)
+    if mpi_dtype is None:
+        raise TypeError(f"no MPI datatype registered for arrays of dtype {x.dtype}")
+    return [x, mpi_dtype]
+
+
+def is_device_array(x) -> bool:
+    """Whether x lives on the GPU and should be reduced with NCCL instead of MPI"""
+    return cupy is not None and isinstance(x, cupy.ndarray)
+
+
+def get_array_module(x):
+    """Return cupy for GPU arrays and numpy otherwise"""
+    return cupy if is_device_array(x) else np
+
+
+def _has_gpu() -> bool:
+    if cupy is None:
+        return False
+    try:
+        return cupy.cuda.runtime.getDeviceCount() > 0
+    except cupy.cuda.runtime.CUDARuntimeError:
+        return False
+
+
+def _empty(shape, dtype, xp):
+    if xp is np and _has_gpu():
+        # page-locked host memory so that host <-> device copies and CUDA-aware MPI can DMA
+        # straight from the buffer
+        dtype = np.dtype(dtype)
+        mem = cupy.cuda.alloc_pinned_memory(max(int(np.prod(shape)) * dtype.itemsize, 1))
+        return np.frombuffer(mem, dtype, int(np.prod(shape))).reshape(shape)
+    return xp.empty(shape, dtype=dtype)
+
+
+def _buf_key(shape, dtype, tag, xp):
+    return (tag, xp.__name__, tuple(shape), np.dtype(dtype))
+
+
+def get_buf(shape, dtype, tag: str, xp=np):
+    """Return the persistent buffer registered under (tag, shape, dtype), allocating it on first use
+
+    The buffer is shared by every caller using the same tag, so its contents are only valid
+    until the next call with that tag.
+    """
+    key = _buf_key(shape, dtype, tag, xp)
+    buf = _buf_pool.get(key)
+    if buf is None:
+        buf = _buf_pool[key] = _empty(shape, dtype, xp)
+    return buf
+
+
+def take_buf(shape, dtype, tag: str, xp=np):
+    """Like get_buf, but remove the buffer from the pool until release_buf hands it back
+
+    Use this for buffers that stay in use across calls (e.g. by non-blocking collectives) so
+    that concurrent users never share them.
+    """
+    buf = _buf_pool.pop(_buf_key(shape, dtype, tag, xp), None)
+    if buf is None:
+        buf = _empty(shape, dtype, xp)
+    return buf
+
+
+def release_buf(buf, tag: str):
+    """Return a buffer obtained from take_buf to the pool"""
+    _buf_pool[_buf_key(buf.shape, buf.dtype, tag, get_array_module(buf))] = buf
+
+
+# arrays smaller than this are packed with NumPy, whose per-call overhead is lower than
+# waking up the Numba thread pool
+NUMBA_PACK_MIN_SIZE = 1 << 16
+
+
+def _get_numba_kernels():
+    """Import Numba and build the pack/unpack kernels on first use, or return None without Numba
+
+    Importing Numba costs every rank a noticeable startup delay, so it is deferred until an
+    array is large enough to use the kernels. cache=True stores the compiled kernels on disk
+    so that later runs skip the JIT compilation.
+    """
+    global _numba_kernels
+    if _numba_kernels is not None:
+        return _numba_kernels or None
+
+    try:
+        from numba import njit, prange
+    except ImportError:
+        _numba_kernels = False
+        return None
+
+    # each MPI rank runs its own thread pool; cap it with NUMBA_NUM_THREADS when several
+    # ranks share a node
+
+    @njit(parallel=True, cache=True)
+    def pack_kernel(src, dst):
+        mp_size, batch_size, part_dim = dst.shape
+        for b in prange(batch_size):
+            for r in range(mp_size):
+                dst[r, b, :] = src[b, r * part_dim : (r + 1) * part_dim]
+
+    @njit(parallel=True, cache=True)
+    def unpack_kernel(src, dst):
+        mp_size, batch_size, part_dim = src.shape
+        for b in prange(batch_size):
+            for r in range(mp_size):
+                dst[b, r * part_dim : (r + 1) * part_dim] = src[r, b, :]
+
+    _numba_kernels = (pack_kernel, unpack_kernel)
+    return _numba_kernels
+
+
+def _numba_kernels_for(src, dst):
+    """Return the Numba (pack, unpack) kernels if they should handle src/dst, else None"""
+    if (
+        is_device_array(src)
+        or src.size < NUMBA_PACK_MIN_SIZE
+        or not src.flags.c_contiguous
+        or not dst.flags.c_contiguous
+    ):
+        return None
+    return _get_numba_kernels()
+
+
+def pack_column_blocks(src, dst):
+    """Copy the column blocks of src (batch_size, mp_size * part_dim) into dst (mp_size, batch_size, part_dim)"""
+    kernels = _numba_kernels_for(src, dst)
+    if kernels is not None:
+        kernels[0](src, dst)
+        return dst
+    mp_size, batch_size, part_dim = dst.shape
+    get_array_module(src).copyto(dst, src.reshape(batch_size, mp_size, part_dim).transpose(1, 0, 2))
+    return dst
+
+
+def unpack_column_blocks(src, dst):
+    """Copy the blocks of src (mp_size, batch_size, part_dim) side by side into dst (batch_size, mp_size * part_dim)"""
+    kernels = _numba_kernels_for(src, dst)
+    if kernels is not None:
+        kernels[1](src, dst)
+        return dst
+    mp_size, batch_size, part_dim = src.shape
+    get_array_module(src).copyto(dst.reshape(batch_size, mp_size, part_dim), src.transpose(1, 0, 2))
+    return dst
+
+
+if nccl is not None:
+    _NCCL_DTYPE = {
+        np.dtype(np.float32): nccl.NCCL_FLOAT32,
+        np.dtype(np.float64): nccl.NCCL_FLOAT64,
+        np.dtype(np.int32): nccl.NCCL_INT32,
+    }
+
+# persistent communication buffers, keyed by (tag, array module, shape, dtype). Reusing the
+# same memory every iteration means the MPI library (or the NIC, for RDMA transports) only
+# has to register/pin each buffer once instead of on every call
+_buf_pool = {}
+
+# Numba (pack, unpack) kernels built on first use by _get_numba_kernels; False without Numba
+_numba_kernels = None
+
+# MPI op summing bfloat16 payloads, created on first use by _bf16_sum_op
+_bf16_sum = None
+
+# (local_comm, leader_comm) node groups built by get_node_groups, one per communicator
+_node_groups = {}
+
+# NCCL communicators and their dedicated streams, one per MPI communicator they were built from
+_nccl_comms = {}
+
+
+class NcclRequest(object):
+    def __init__(self, stream):
+        """Request for a collective enqueued on a dedicated NCCL stream
+
+        :param stream: The stream the collective was enqueued on
+        :type stream: cupy.cuda.Stream
+        """
+        self.stream = stream
+
+    def Wait(self):
+        self.stream.synchronize()
+
+
+def _get_nccl_comm(comm):
+    """Build (once) the NCCL communicator spanning the same ranks as the MPI communicator comm
+
+    The caller is responsible for selecting the CUDA device of each rank beforehand.
+    """
+    # key on the MPI handle: layers hold separate Communicator wrappers of the same group
+    mpi_comm = getattr(comm, "comm", comm)
+    entry = _nccl_comms.get(id(mpi_comm))
+    if entry is not None and entry[0] is mpi_comm:
+        return entry[1], entry[2]
+
+    uid = nccl.get_unique_id() if comm.Get_rank() == 0 else None
+    uid = comm.bcast(uid, root=0)
+    nccl_comm = nccl.NcclCommunicator(comm.Get_size(), uid, comm.Get_rank())
+    # reductions run on their own stream so they can overlap compute on the current stream
+    stream = cupy.cuda.Stream(non_blocking=True)
+
+    _nccl_comms[id(mpi_comm)] = (mpi_comm, nccl_comm, stream)
+    return nccl_comm, stream
+
+
+def _enqueue_nccl(comm, launch):
+    """Order a NCCL collective after the pending work of the current stream and launch it"""
+    nccl_comm, stream = _get_nccl_comm(comm)
+    stream.wait_event(cupy.cuda.get_current_stream().record())
+    launch(nccl_comm, stream)
+    return stream
+
+
+def allreduce(x, comm):
+    """Sum x in place across comm, using NCCL for GPU arrays and MPI otherwise"""
+    if is_device_array(x):
+        request = iallreduce(x, comm)
+        # later work on the current stream sees the reduced values
+        cupy.cuda.get_current_stream().wait_event(request.stream.record())
+        return x
+
+    comm.Allreduce(MPI.IN_PLACE, _typed(x), op=MPI.SUM)
+    return x
+
+
+def iallreduce(x, comm):
+    """Start summing x in place across comm and return a request exposing Wait()"""
+    if is_device_array(x):
+        stream = _enqueue_nccl(
+            comm,
+            lambda nccl_comm, stream: nccl_comm.allReduce(
+                x.data.ptr, x.data.ptr, x.size, _NCCL_DTYPE[x.dtype], nccl.NCCL_SUM, stream.ptr
+            ),
+        )
+        return NcclRequest(stream)
+
+    return comm.Iallreduce(MPI.IN_PLACE, _typed(x), op=MPI.SUM)
+
+
+def reduce_scatter_block(send_buf, recv_buf, comm):
+    """Sum send_buf across comm and scatter equal blocks of the result into recv_buf"""
+    if is_device_array(send_buf):
+        stream = _enqueue_nccl(
+            comm,
+            lambda nccl_comm, stream: nccl_comm.reduceScatter(
+                send_buf.data.ptr,
+                recv_buf.data.ptr,
+                recv_buf.size,
+                _NCCL_DTYPE[recv_buf.dtype],
+                nccl.NCCL_SUM,
+                stream.ptr,
+            ),
+        )
+        cupy.cuda.get_current_stream().wait_event(stream.record())
+        return recv_buf
+
+    comm.Reduce_scatter_block(_typed(send_buf), _typed(recv_buf), op=MPI.SUM)
+    return recv_buf
+
+
+def allgather(send_buf, recv_buf, comm):
+    """Gather the equal-sized send_buf of every rank of comm into recv_buf, rank-major"""
+    if is_device_array(send_buf):
+        stream = _enqueue_nccl(
+            comm,
+            lambda nccl_comm, stream: nccl_comm.allGather(
+                send_buf.data.ptr,
+                recv_buf.data.ptr,
+                send_buf.size,
+                _NCCL_DTYPE[send_buf.dtype],
+                stream.ptr,
+            ),
+        )
+        cupy.cuda.get_current_stream().wait_event(stream.record())
+        return recv_buf
+
+    comm.Allgather(_typed(send_buf), _typed(recv_buf))
+    return recv_buf
+
+
+def get_node_groups(comm):
+    """Build (once) the intra-node and inter-node sub-communicators of comm
+
+    Must be called collectively by every rank of comm. Returns (local_comm, leader_comm),
+    where leader_comm only spans the first rank of every node and is a null communicator on
+    the other ranks, or None when comm lives on a single node or has one rank per node and a
+    hierarchical reduction would not help.
+    """
+    # key on the MPI handle: layers hold separate Communicator wrappers of the same group
+    mpi_comm = getattr(comm, "comm", comm)
+    entry = _node_groups.get(id(mpi_comm))
+    if entry is not None and entry[0] is mpi_comm:
+        return entry[1]
+
+    rank = comm.Get_rank()
+    local_comm = comm.Split_type(MPI.COMM_TYPE_SHARED, key=rank)
+    is_leader = local_comm.Get_rank() == 0
+    leader_comm = comm.Split(color=0 if is_leader else MPI.UNDEFINED, key=rank)
+
+    # every rank must take the same decision, so count the nodes collectively
+    num_nodes = np.array([int(is_leader)], dtype=np.int32)
+    comm.Allreduce(MPI.IN_PLACE, _typed(num_nodes), op=MPI.SUM)
+    groups = (local_comm, leader_comm) if 1 < num_nodes[0] < comm.Get_size() else None
+
+    _node_groups[id(mpi_comm)] = (mpi_comm, groups)
+    return groups
+
+
+def _bytes_transferred(*comms):
+    return sum(getattr(comm, "total_bytes_transferred", 0) for comm in comms)
+
+
+def hierarchical_allreduce(x: np.ndarray, local_comm, leader_comm, comm=None):
+    """Sum x in place with an intra-node Reduce, an inter-node Allreduce among the node
+    leaders and an intra-node Bcast of the result
+
+    The node groups are shared by every user of comm, so the bytes they move during this
+    call are charged to comm (when given) to keep its communication statistics complete.
+    """
+    transferred = _bytes_transferred(local_comm, leader_comm)
+    buf = _typed(x)
+    if local_comm.Get_rank() == 0:
+        local_comm.Reduce(MPI.IN_PLACE, buf, op=MPI.SUM, root=0)
+        leader_comm.Allreduce(MPI.IN_PLACE, buf, op=MPI.SUM)
+    else:
+        local_comm.Reduce(buf, None, op=MPI.SUM, root=0)
+    local_comm.Bcast(buf, root=0)
+    if comm is not None and hasattr(comm, "total_bytes_transferred"):
+        comm.total_bytes_transferred += _bytes_transferred(local_comm, leader_comm) - transferred
+    return x
+
+
+def to_bfloat16_bits(x: np.ndarray, out: np.ndarray = None):
+    """Round x to bfloat16 (round-to-nearest-even) and return the raw 16-bit patterns as uint16"""
+    bits = np.ascontiguousarray(x, dtype=np.float32).view(np.uint32)
+    rounded = (bits + (0x7FFF + ((bits >> 16) & 1))) >> 16
+    # keep NaNs NaN instead of letting the rounding carry turn them into infinities
+    rounded = np.where(np.isnan(x), 0x7FC0, rounded)
+    if out is None:
+        return rounded.astype(np.uint16)
+    np.copyto(out, rounded, casting="unsafe")
+    return out
+
+
+def from_bfloat16_bits(bits: np.ndarray, out: np.ndarray = None):
+    """Expand uint16 bfloat16 patterns back to floating point (float32 unless out says otherwise)"""
+    values = (bits.astype(np.uint32) << 16).view(np.float32)
+    if out is None:
+        return values
+    np.copyto(out, values.reshape(out.shape))
+    return out
+
+
+def _bf16_sum_fn(inbuf, inoutbuf, datatype):
+    a = np.frombuffer(inbuf, dtype=np.uint16)
+    b = np.frombuffer(inoutbuf, dtype=np.uint16)
+    to_bfloat16_bits(from_bfloat16_bits(a) + from_bfloat16_bits(b), out=b)
+
+
+def _bf16_sum_op():
+    global _bf16_sum
+    if _bf16_sum is None:
+        _bf16_sum = MPI.Op.Create(_bf16_sum_fn, commute=True)
+    return _bf16_sum
+
+
+class Bfloat16Request(object):
+    def __init__(self, request, bits, out):
+        """Request for a bfloat16 Allreduce whose result is expanded into out on completion
+
+        :param request: The outstanding MPI request
+        :type request: MPI.Request
+        :param bits: The uint16 buffer being reduced
+        :type bits: np.ndarray
+        :param out: The floating point array receiving the reduced values
+        :type out: np.ndarray
+        """
+        self.request = request
+        self.bits = bits
+        self.out = out
+
+    def Wait(self):
+        self.request.Wait()
+        from_bfloat16_bits(self.bits, out=self.out)
+        release_buf(self.bits, tag="bf16_allreduce")
+
+
+def iallreduce_bf16(x: np.ndarray, comm):
+    """Start summing the floating point array x in place across comm with bfloat16 payloads
+
+    Halves the bytes on the wire for float32 (quarters them for float64). bfloat16 keeps the
+    float32 exponent range, so gradients need no loss scaling, but only about three significant
+    digits survive and every reduction step rounds again.
+    """
+    bits = take_buf((x.size,), np.uint16, tag="bf16_allreduce")
+    to_bfloat16_bits(x.ravel(), out=bits)
+    request = comm.Iallreduce(MPI.IN_PLACE, [bits, MPI.UNSIGNED_SHORT], op=_bf16_sum_op())
+    return Bfloat16Request(request, bits, x)
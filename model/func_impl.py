@@ -1,5 +1,135 @@
 import numpy as np
-from mpi4py import MPI
+
+from .backend import (
+    _typed,
+    allgather,
+    allreduce,
+    get_array_module,
+    get_buf,
+    get_node_groups,
+    hierarchical_allreduce,
+    iallreduce,
+    iallreduce_bf16,
+    is_device_array,
+    pack_column_blocks,
+    reduce_scatter_block,
+    release_buf,
+    take_buf,
+    unpack_column_blocks,
+)
+
+
+# gradients whose combined size exceeds this many bytes are reduced with separate calls
+# instead of being packed into a single fused buffer
+FUSION_THRESHOLD_BYTES = 64 * 2**20
+
+# model parallel groups of at most this many ranks collect grad_x in naive_collect_backward_x
+# with Allreduce + a local slice instead of a reduce-scatter. In the alpha-beta cost model the
+# Allreduce moves more bytes but needs fewer latency-bound steps, which wins for small groups
+ALLREDUCE_SLICE_MAX_MP_SIZE = 4
+
+# reduce floating point weight gradients with bfloat16 payloads, halving the bytes of the data
+# parallel Allreduce at the cost of precision
+GRAD_ALLREDUCE_BF16 = False
+
+# data parallel groups of at least this many ranks that span several nodes reduce the weight
+# gradients hierarchically (intra-node Reduce, inter-node Allreduce, intra-node Bcast)
+HIERARCHICAL_ALLREDUCE_MIN_DP_SIZE = 16
+
+
+def _start_allgather_columns(x: np.ndarray, mp_comm, mp_size: int, tag: str):
+    """Start gathering column tiles of shape (batch_size, part_dim) with Iallgather
+
+    MPI packs the received tiles rank-major, so the natural receive layout is
+    (mp_size, batch_size, part_dim); _finish_allgather_columns reorders them. The receive
+    buffer is checked out of the pool until then, so gathers can overlap each other.
+    """
+    # MPI reads x directly, so refuse layouts that would need a silent copy
+    assert x.flags.c_contiguous, "x must be C-contiguous"
+    batch_size, part_dim = x.shape
+
+    recv_buf = take_buf((mp_size, batch_size, part_dim), x.dtype, tag=tag + "_recv")
+    request = mp_comm.Iallgather(_typed(x), _typed(recv_buf))
+    return recv_buf, request
+
+
+def _finish_allgather_columns(recv_buf: np.ndarray, request, tag: str):
+    """Wait for a gather started by _start_allgather_columns and return (batch_size, mp_size * part_dim)
+
+    The tiles are moved into the (batch_size, in_dim) destination in one pass (see
+    unpack_column_blocks), instead of np.concatenate's per-tile copies. The destination is
+    not pooled: callers such as FCLayer keep the result (e.g. as the input saved for
+    backward) beyond the next call.
+    """
+    mp_size, batch_size, part_dim = recv_buf.shape
+    collected = get_array_module(recv_buf).empty((batch_size, mp_size * part_dim), dtype=recv_buf.dtype)
+
+    request.Wait()
+    unpack_column_blocks(recv_buf, collected)
+    release_buf(recv_buf, tag=tag + "_recv")
+    return collected
+
+
+def _allgather_columns(x: np.ndarray, mp_comm, mp_size: int, tag: str):
+    """Allgather column tiles of shape (batch_size, part_dim) into (batch_size, mp_size * part_dim)"""
+    recv_buf, request = _start_allgather_columns(x, mp_comm, mp_size, tag)
+    return _finish_allgather_columns(recv_buf, request, tag)
+
+
+# model/data parallel communicators created by init_parallel_groups, keyed by
+# (id(comm), rank, mp_size, dp_size); the global comm is kept in the value so its id stays valid
+_split_cache = {}
+
+
+def init_parallel_groups(
+    comm,
+    rank: int,
+    mp_size: int,
+    dp_size: int,
+):
+    """The function that splits the global communicator into model/data parallel groups
+
+    The ranks are laid out on a (dp_size, mp_size) Cartesian grid and the groups are its rows
+    (model parallel) and columns (data parallel). Building them is a synchronizing collective,
+    so the resulting communicators are created once per topology and reused by every later
+    call (e.g. one call per layer).
+
+    Parameters
+    ----------
+        comm : Communicator
+            the global mpi communicator
+
+        rank : int
+            the corresponding rank of the process
+
+        mp_size : int
+            Model Parallel size
+
+        dp_size : int
+            Data Parallel size
+
+    Returns
+    -------
+        mp_comm : Communicator
+            The Model Parallel communicator after split
+
+        dp_comm : Communicator
+            The Data Parallel communicator after split
+    """
+    key = (id(comm), rank, mp_size, dp_size)
+    cached = _split_cache.get(key)
+    if cached is not None and cached[0] is comm:
+        return cached[1], cached[2]
+
+    assert comm.Get_size() == mp_size * dp_size, "mp_size * dp_size must match the communicator size"
+
+    # no reordering: callers rely on rank == dp_idx * mp_size + mp_idx (row-major grid coordinates)
+    cart = comm.Create_cart(dims=[dp_size, mp_size], periods=[False, False], reorder=False)
+    mp_comm = cart.Sub([False, True])
+    dp_comm = cart.Sub([True, False])
+
+    _split_cache[key] = (comm, mp_comm, dp_comm)
+    return mp_comm, dp_comm
 
 
 def get_info(
@@ -68,10 +198,9 @@ def get_info(
     # Get the model/data parallel communication groups
     # the model/data parallel communication group is required to apply mpi operations within the scope of the group
     # Hint: try to figure out the relationship between the mp_idx, dp_idx with the mp/dp communication group
-    #       and use the comm.Split() function to get the corresponding group.
+    #       and use the Cartesian topology (rows / columns) to get the corresponding group.
 
-    mp_comm = comm.Split(color=dp_idx, key=rank)
-    dp_comm = comm.Split(color=mp_idx, key=rank)
+    mp_comm, dp_comm = init_parallel_groups(comm=comm, rank=rank, mp_size=mp_size, dp_size=dp_size)
 
     # Derive the part_in_dim and part_out_dim depend on is_fc1 and is_megatron_mp
 
@@ -120,11 +249,127 @@ def naive_collect_forward_input(
     #       might not align with your expected layout. In order to get the correct layout, you may wish to use some NumPy
     #       functions (np.split and np.concatenate might be helpful).
 
-    gathered = mp_comm.allgather(x)
-    collected_x = np.concatenate(gathered, axis=1)
+    collected_x = _allgather_columns(x, mp_comm, mp_size, tag="forward_input")
     return collected_x
 
 
+def naive_start_collect_forward_input(
+    x: np.ndarray,
+    mp_comm,
+    mp_size: int,
+):
+    """The non-blocking counterpart of naive_collect_forward_input
+
+    Parameters
+    ----------
+        x : np.ndarray
+            layer input for a single node of shape (batch_size, part_in_dim); it must not be
+            modified until naive_finish_collect_forward_input returns
+
+        mp_comm : Communicator
+            The Model Parallel communicator
+
+        mp_size : int
+            Model Parallel size
+
+    Returns
+    -------
+        recv_buf : np.ndarray
+            receive buffer of shape (mp_size, batch_size, part_in_dim) filled by the gather; it
+            is owned by this gather until naive_finish_collect_forward_input returns it
+
+        request : MPI.Request
+            the outstanding Iallgather request
+
+    """
+    return _start_allgather_columns(x, mp_comm, mp_size, tag="forward_input")
+
+
+def naive_finish_collect_forward_input(
+    recv_buf: np.ndarray,
+    request,
+):
+    """Complete a gather started by naive_start_collect_forward_input
+
+    Parameters
+    ----------
+        recv_buf : np.ndarray
+            receive buffer returned by naive_start_collect_forward_input
+
+        request : MPI.Request
+            request returned by naive_start_collect_forward_input
+
+    Returns
+    -------
+        collected_x : np.ndarray
+            collected layer inputs across different nodes of shape (batch_size, in_dim)
+
+    """
+    return _finish_allgather_columns(recv_buf, request, tag="forward_input")
+
+
+class BatchedCollector(object):
+    def __init__(self, mp_comm, mp_size: int, num_micro_batches: int):
+        """Aggregates the naive_collect_forward_input gathers of several micro-batches into one Allgather
+
+        Every call pays the per-message latency once, so gathering num_micro_batches inputs of
+        the same shape together amortizes it over a num_micro_batches times larger message. Pick
+        num_micro_batches so that the aggregated message is large enough to be bandwidth bound.
+
+        :param mp_comm: The Model Parallel communicator
+        :type mp_comm: Communicator
+        :param mp_size: Model Parallel size
+        :type mp_size: int
+        :param num_micro_batches: The number of queued micro-batches that triggers the gather
+        :type num_micro_batches: int
+        """
+        assert num_micro_batches > 0
+        self.mp_comm = mp_comm
+        self.mp_size = mp_size
+        self.num_micro_batches = num_micro_batches
+        # owned by this collector: queued inputs and handed-out results outlive a single call,
+        # so they must not come from the shared buffer pool
+        self.send_buf = None
+        self.collected = None
+        self.count = 0
+
+    def add(self, x: np.ndarray):
+        """Queue the layer input x of shape (batch_size, part_in_dim) of one micro-batch
+
+        Returns the collected inputs (see flush) once num_micro_batches inputs are queued, else None.
+        """
+        if self.send_buf is None:
+            batch_size, part_dim = x.shape
+            self.send_buf = np.empty((self.num_micro_batches, batch_size, part_dim), dtype=x.dtype)
+            self.collected = np.empty((self.num_micro_batches, batch_size, self.mp_size * part_dim), dtype=x.dtype)
+        assert x.shape == self.send_buf.shape[1:] and x.dtype == self.send_buf.dtype, "micro-batches must match"
+
+        self.send_buf[self.count] = x
+        self.count += 1
+        if self.count == self.num_micro_batches:
+            return self.flush()
+        return None
+
+    def flush(self):
+        """Gather the queued inputs with a single Allgather
+
+        Returns a list with one (batch_size, in_dim) array per queued micro-batch, in the order
+        they were added. The arrays are reused by the next flush of this collector.
+        """
+        if self.count == 0:
+            return []
+        count, self.count = self.count, 0
+        _, batch_size, part_dim = self.send_buf.shape
+        dtype = self.send_buf.dtype
+
+        # a leading slice of the send buffer is still contiguous, so partial flushes need no copy.
+        # recv_buf is fully consumed before returning, so it can be shared through the pool
+        recv_buf = get_buf((self.mp_size, count, batch_size, part_dim), dtype, tag="batched_forward_input_recv")
+        self.mp_comm.Allgather(_typed(self.send_buf[:count]), _typed(recv_buf))
+
+        return [unpack_column_blocks(recv_buf[:, i], self.collected[i]) for i in range(count)]
+
+
 def naive_collect_forward_output(
     out: np.ndarray,
     mp_comm,
@@ -150,8 +395,7 @@ def naive_collect_forward_output(
 
     """
 
-    gathered = mp_comm.allgather(out)
-    collected_out = np.concatenate(gathered, axis=1)
+    collected_out = _allgather_columns(out, mp_comm, mp_size, tag="forward_output")
     return collected_out
 
 def megatron_collect_forward_input(
@@ -188,6 +432,7 @@ def megatron_collect_forward_output(
     out: np.ndarray,
     mp_comm,
     mp_size: int,
+    bias: np.ndarray = None,
 ):
     """The function for collecting layer fc2's outputs across different nodes with megatron-style model parallelism
 
@@ -202,6 +447,10 @@ def megatron_collect_forward_output(
         mp_size : int
             Model Parallel size
 
+        bias : np.ndarray, optional
+            local bias of shape (1, part_out_dim) to add to out before the reduction; it is added
+            in place on the reduction buffer so no separate output array is materialized
+
     Returns
     -------
         collected_out : np.ndarray
@@ -210,10 +459,97 @@ def megatron_collect_forward_output(
     """
     # Hint: try to work through a toy forward example for megatron-style model parallel to figure out the
     #       the communication functions that you might need
-    collected_out = np.empty_like(out)
-    mp_comm.Allreduce(out, collected_out, op=MPI.SUM)
+    # reduce in place so no separate destination buffer is allocated
+    xp = get_array_module(out)
+    assert out.flags.c_contiguous, "out must be C-contiguous to be reduced in place"
+    collected_out = out
+    if bias is not None:
+        xp.add(collected_out, bias, out=collected_out)
+    collected_out = allreduce(collected_out, mp_comm)
     return collected_out
 
+def megatron_scatter_forward_output(
+    out: np.ndarray,
+    mp_comm,
+    mp_size: int,
+    bias: np.ndarray = None,
+):
+    """The function for reducing layer fc2's outputs with megatron-style sequence parallelism
+
+    Instead of an Allreduce, the partial outputs are summed with a Reduce_scatter over the batch
+    dimension, so every node ends up with the complete outputs of batch_size // mp_size samples.
+    Per-sample work after fc2 (softmax, loss) then runs on the shard only, and the shards are
+    gathered again by megatron_gather_backward_output before the next matmul (fc2's backward).
+
+    Parameters
+    ----------
+        out : np.ndarray
+            layer output for a single node of shape (batch_size, out_dim); batch_size must be
+            divisible by mp_size
+
+        mp_comm : Communicator
+            The Model Parallel communicator
+
+        mp_size : int
+            Model Parallel size
+
+        bias : np.ndarray, optional
+            local bias of shape (1, out_dim) to add to out before the reduction, as in
+            megatron_collect_forward_output
+
+    Returns
+    -------
+        out_shard : np.ndarray
+            rows [mp_group_idx * batch_size // mp_size, (mp_group_idx + 1) * batch_size // mp_size)
+            of the collected layer outputs, of shape (batch_size // mp_size, out_dim)
+
+    """
+    xp = get_array_module(out)
+    assert out.flags.c_contiguous, "out must be C-contiguous"
+    batch_size, out_dim = out.shape
+    assert batch_size % mp_size == 0, "batch_size must be divisible by mp_size"
+
+    if bias is not None:
+        xp.add(out, bias, out=out)
+    # the row blocks of out are contiguous, so the reduction needs no packing
+    out_shard = get_buf((batch_size // mp_size, out_dim), out.dtype, tag="forward_output_shard", xp=xp)
+    return reduce_scatter_block(out, out_shard, mp_comm)
+
+
+def megatron_gather_backward_output(
+    output_grad: np.ndarray,
+    mp_comm,
+    mp_size: int,
+):
+    """The function for collecting layer fc2's output_grad shards with megatron-style sequence parallelism
+
+    Parameters
+    ----------
+        output_grad : np.ndarray
+            output_grad of this node's shard, of shape (batch_size // mp_size, out_dim)
+
+        mp_comm : Communicator
+            The Model Parallel communicator
+
+        mp_size : int
+            Model Parallel size
+
+    Returns
+    -------
+        collected_output_grad : np.ndarray
+            output_grad of the whole batch, of shape (batch_size, out_dim)
+
+    """
+    xp = get_array_module(output_grad)
+    assert output_grad.flags.c_contiguous, "output_grad must be C-contiguous"
+    shard_size, out_dim = output_grad.shape
+
+    # the shards are row blocks, so the rank-major receive layout is already the batch order
+    collected_output_grad = get_buf(
+        (mp_size * shard_size, out_dim), output_grad.dtype, tag="backward_output_gather", xp=xp
+    )
+    return allgather(output_grad, collected_output_grad, mp_comm)
+
 def naive_collect_backward_output(
     output_grad: np.ndarray,
     mp_group_idx: int,
@@ -271,24 +607,26 @@ def naive_collect_backward_x(
     #         , so you might to check the naive_collect_forward_output() impl.
 
     # Hint 2: You might want to use reduce_scatter
-    # ensure grad_x is contiguous memory layout
-    grad_x = np.ascontiguousarray(grad_x)
     batch_size, in_dim = grad_x.shape
     part_in_dim = in_dim // mp_size
-
-    # transpose grad_x: shape becomes (in_dim, batch_size)
-    trans_grad_x = grad_x.T.copy()  # ensure new array is contiguous
-
-    # 准备接收缓冲区：每个节点接收 part_in_dim * batch_size 个元素
-    recv_buf = np.empty(part_in_dim * batch_size, dtype=grad_x.dtype)
-
-    # use Reduce_scatter to sum the transposed flattened data and scatter to each node
-    mp_comm.Reduce_scatter([trans_grad_x.flatten(), MPI.DOUBLE],
-                           [recv_buf, MPI.DOUBLE],
-                           op=MPI.SUM)
-
-    # reshape the received data: shape becomes (part_in_dim, batch_size), then transpose to (batch_size, part_in_dim)
-    collected_grad_x = np.reshape(recv_buf, (part_in_dim, batch_size)).T
+    xp = get_array_module(grad_x)
+    assert grad_x.flags.c_contiguous, "grad_x must be C-contiguous"
+
+    if mp_size <= ALLREDUCE_SLICE_MAX_MP_SIZE:
+        # for a handful of ranks a single Allreduce pays fewer startups than a reduce-scatter,
+        # which outweighs reducing the full grad_x instead of one block; grad_x is overwritten
+        mp_idx = mp_comm.Get_rank()
+        reduced_grad_x = allreduce(grad_x, mp_comm)
+        return xp.ascontiguousarray(reduced_grad_x[:, mp_idx * part_in_dim : (mp_idx + 1) * part_in_dim])
+
+    # lay the send buffer out rank-major so that every destination's chunk is one contiguous
+    # (batch_size, part_in_dim) block, packing all blocks in a single pass
+    send_buf = get_buf((mp_size, batch_size, part_in_dim), grad_x.dtype, tag="backward_x_send", xp=xp)
+    pack_column_blocks(grad_x, send_buf)
+
+    # the result lives in a pooled buffer that the next call with the same shape reuses
+    collected_grad_x = get_buf((batch_size, part_in_dim), grad_x.dtype, tag="backward_x_recv", xp=xp)
+    reduce_scatter_block(send_buf, collected_grad_x, mp_comm)
     return collected_grad_x
 
 def megatron_collect_backward_output(
@@ -375,10 +713,112 @@ def collect_weight_grad(
 
     """
     # Hint: Think about how you might want to aggregate the gradients from different nodes in data parallel training
-    collected_grad_w = np.empty_like(grad_w)
-    collected_grad_b = np.empty_like(grad_b)
-    
-    dp_comm.Allreduce(grad_w, collected_grad_w, op=MPI.SUM)
-    dp_comm.Allreduce(grad_b, collected_grad_b, op=MPI.SUM)
-    
-    return collected_grad_w, collected_grad_b
\ No newline at end of file
+    # the request is never released, so the returned arrays keep sole ownership of its buffer
+    return start_collect_weight_grad(grad_w=grad_w, grad_b=grad_b, dp_comm=dp_comm).wait()
+
+
+class WeightGradRequest(object):
+    def __init__(self, requests, collected_grad_w, collected_grad_b, fused_buf=None):
+        """Handle for an in-flight weight gradient reduction started by start_collect_weight_grad
+
+        :param requests: The outstanding MPI requests
+        :type requests: list
+        :param collected_grad_w: The array that holds the reduced weight gradients once the requests complete
+        :type collected_grad_w: np.ndarray
+        :param collected_grad_b: The array that holds the reduced bias gradients once the requests complete
+        :type collected_grad_b: np.ndarray
+        :param fused_buf: The packed buffer backing both gradients, defaults to None
+        :type fused_buf: np.ndarray, optional
+        """
+        self.requests = requests
+        self.collected_grad_w = collected_grad_w
+        self.collected_grad_b = collected_grad_b
+        self.fused_buf = fused_buf
+
+    def wait(self):
+        """Block until the reduction finishes and return (collected_grad_w, collected_grad_b)
+
+        The returned arrays may be views into the packed buffer, so they stay valid until release().
+        """
+        for request in self.requests:
+            request.Wait()
+        self.requests = []
+        return self.collected_grad_w, self.collected_grad_b
+
+    def release(self):
+        """Complete the reduction and hand the packed buffer back to the pool for the next iteration
+
+        Only call this once the arrays returned by wait() are no longer used.
+        """
+        self.wait()
+        if self.fused_buf is not None:
+            release_buf(self.fused_buf, tag="weight_grad")
+            self.fused_buf = None
+        self.collected_grad_w = self.collected_grad_b = None
+
+
+def _start_grad_allreduce(x, dp_comm):
+    """Start the in-place sum of x across dp_comm and return the outstanding requests"""
+    # GPU arrays go through NCCL, which already picks topology-aware algorithms
+    if dp_comm.Get_size() >= HIERARCHICAL_ALLREDUCE_MIN_DP_SIZE and not is_device_array(x):
+        node_groups = get_node_groups(dp_comm)
+        if node_groups is not None:
+            # the three stages depend on each other, so this path completes before returning
+            hierarchical_allreduce(x, *node_groups, comm=dp_comm)
+            return []
+    if GRAD_ALLREDUCE_BF16 and not is_device_array(x) and x.dtype.kind == "f":
+        return [iallreduce_bf16(x, dp_comm)]
+    return [iallreduce(x, dp_comm)]
+
+
+def start_collect_weight_grad(
+    grad_w: np.ndarray,
+    grad_b: np.ndarray,
+    dp_comm,
+):
+    """The non-blocking counterpart of collect_weight_grad
+
+    The reduction is issued with Iallreduce so that it can overlap with the backward
+    compute of the preceding layers; call wait() on the returned request right before
+    the optimizer consumes the gradients, and release() once they are no longer used.
+
+    Parameters
+    ----------
+        grad_w : np.ndarray
+            gradients value for fc weight on a single node of shape (in_dim, out_dim)
+
+        grad_b : np.ndarray
+            gradients value for fc bias on a single node of shape (1, out_dim)
+
+        dp_comm : Communicator
+            The Data Parallel communicator
+
+    Returns
+    -------
+        request : WeightGradRequest
+            handle whose wait() returns the collected (grad_w, grad_b) across different nodes
+
+    """
+    xp = get_array_module(grad_w)
+
+    if grad_w.dtype != grad_b.dtype or grad_w.nbytes + grad_b.nbytes > FUSION_THRESHOLD_BYTES:
+        # reduce in place: the caller replaces its gradients with the returned arrays anyway
+        assert grad_w.flags.c_contiguous and grad_b.flags.c_contiguous, "gradients must be C-contiguous"
+        requests = _start_grad_allreduce(grad_w, dp_comm) + _start_grad_allreduce(grad_b, dp_comm)
+        return WeightGradRequest(requests, grad_w, grad_b)
+
+    # pack both gradients into one contiguous buffer so that a single collective pays the
+    # startup latency for both, then hand back views into the reduced buffer. The buffer
+    # is taken out of the pool while the request is in flight so that concurrent requests
+    # of the same size never share it.
+    size_w = grad_w.size
+    fused_buf = take_buf((size_w + grad_b.size,), grad_w.dtype, tag="weight_grad", xp=xp)
+
+    xp.copyto(fused_buf[:size_w].reshape(grad_w.shape), grad_w)
+    xp.copyto(fused_buf[size_w:].reshape(grad_b.shape), grad_b)
+    requests = _start_grad_allreduce(fused_buf, dp_comm)
+
+    collected_grad_w = fused_buf[:size_w].reshape(grad_w.shape)
+    collected_grad_b = fused_buf[size_w:].reshape(grad_b.shape)
+
+    return WeightGradRequest(requests, collected_grad_w, collected_grad_b, fused_buf)
@@ -1,11 +1,22 @@
 from mpi4py import MPI
 
 
+def _buffer_array(buf):
+    """Return the array behind an mpi4py buffer argument ([array, datatype] or a bare array)"""
+    if isinstance(buf, (list, tuple)):
+        return buf[0]
+    return buf
+
+
 class Communicator(object):
     def __init__(self, comm: MPI.Comm):
         self.comm = comm
         self.total_bytes_transferred = 0
 
+    def __copy__(self):
+        # a new handle on the same communicator with its own traffic counter
+        return __class__(self.comm)
+
     def Get_size(self):
         return self.comm.Get_size()
 
@@ -15,25 +26,75 @@ class Communicator(object):
     def Barrier(self):
         return self.comm.Barrier()
 
+    def bcast(self, obj, root=0):
+        return self.comm.bcast(obj, root=root)
+
     def Allreduce(self, src_array, dest_array, op=MPI.SUM):
-        assert src_array.size == dest_array.size
-        src_array_byte = src_array.itemsize * src_array.size
+        dest = _buffer_array(dest_array)
+        src = dest if src_array is MPI.IN_PLACE else _buffer_array(src_array)
+        assert src.size == dest.size
+        src_array_byte = src.itemsize * src.size
         self.total_bytes_transferred += src_array_byte * 2 * (self.comm.Get_size() - 1)
         self.comm.Allreduce(src_array, dest_array, op)
 
+    def Iallreduce(self, src_array, dest_array, op=MPI.SUM):
+        dest = _buffer_array(dest_array)
+        src = dest if src_array is MPI.IN_PLACE else _buffer_array(src_array)
+        assert src.size == dest.size
+        src_array_byte = src.itemsize * src.size
+        self.total_bytes_transferred += src_array_byte * 2 * (self.comm.Get_size() - 1)
+        return self.comm.Iallreduce(src_array, dest_array, op)
+
+    def Reduce(self, src_array, dest_array, op=MPI.SUM, root=0):
+        src = _buffer_array(dest_array) if src_array is MPI.IN_PLACE else _buffer_array(src_array)
+        src_array_byte = src.itemsize * src.size
+        self.total_bytes_transferred += src_array_byte * (self.comm.Get_size() - 1)
+        self.comm.Reduce(src_array, dest_array, op, root)
+
+    def Bcast(self, array, root=0):
+        src = _buffer_array(array)
+        src_array_byte = src.itemsize * src.size
+        self.total_bytes_transferred += src_array_byte * (self.comm.Get_size() - 1)
+        self.comm.Bcast(array, root)
+
     def Allgather(self, src_array, dest_array):
-        src_array_byte = src_array.itemsize * src_array.size
-        dest_array_byte = dest_array.itemsize * dest_array.size
+        src = _buffer_array(src_array)
+        dest = _buffer_array(dest_array)
+        src_array_byte = src.itemsize * src.size
+        dest_array_byte = dest.itemsize * dest.size
         self.total_bytes_transferred += src_array_byte * (self.comm.Get_size() - 1)
         self.total_bytes_transferred += dest_array_byte * (self.comm.Get_size() - 1)
         self.comm.Allgather(src_array, dest_array)
 
+    def Iallgather(self, src_array, dest_array):
+        src = _buffer_array(src_array)
+        dest = _buffer_array(dest_array)
+        src_array_byte = src.itemsize * src.size
+        dest_array_byte = dest.itemsize * dest.size
+        self.total_bytes_transferred += src_array_byte * (self.comm.Get_size() - 1)
+        self.total_bytes_transferred += dest_array_byte * (self.comm.Get_size() - 1)
+        return self.comm.Iallgather(src_array, dest_array)
+
     def Reduce_scatter(self, src_array, dest_array, op=MPI.SUM):
-        src_array_byte = src_array.itemsize * src_array.size
-        dest_array_byte = dest_array.itemsize * dest_array.size
+        src = _buffer_array(src_array)
+        dest = _buffer_array(dest_array)
+        src_array_byte = src.itemsize * src.size
+        dest_array_byte = dest.itemsize * dest.size
         self.total_bytes_transferred += src_array_byte * (self.comm.Get_size() - 1)
         self.total_bytes_transferred += dest_array_byte * (self.comm.Get_size() - 1)
         self.comm.Reduce_scatter_block(src_array, dest_array, op)
 
+    def Reduce_scatter_block(self, src_array, dest_array, op=MPI.SUM):
+        return self.Reduce_scatter(src_array, dest_array, op)
+
     def Split(self, key, color):
         return __class__(self.comm.Split(key=key, color=color))
+
+    def Split_type(self, split_type, key=0):
+        return __class__(self.comm.Split_type(split_type, key=key))
+
+    def Create_cart(self, dims, periods=None, reorder=False):
+        return __class__(self.comm.Create_cart(dims, periods=periods, reorder=reorder))
+
+    def Sub(self, remain_dims):
+        return __class__(self.comm.Sub(remain_dims))
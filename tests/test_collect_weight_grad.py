@@ -4,7 +4,11 @@ from mpi4py import MPI
 import numpy as np
 import pytest
 
-from model.func_impl import collect_weight_grad
+import model.backend
+import model.func_impl
+from model.backend import hierarchical_allreduce
+from mpi_wrapper import Communicator
+from model.func_impl import collect_weight_grad, start_collect_weight_grad
 
 
 def check_dp_weight_comm(
@@ -124,3 +128,139 @@ def test_collect_weight_grad_2():
     }
 
     check_dp_weight_comm(input_dict, expect_output_dict)
+
+
+@pytest.mark.mpi
+def test_start_collect_weight_grad():
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    input_w = np.arange(64).reshape((8, 8)).astype(np.float64)
+    input_b = np.arange(32).reshape((4, 8)).astype(np.float64)
+
+    request = start_collect_weight_grad(
+        grad_w=input_w[rank * 2 : rank * 2 + 2],
+        grad_b=input_b[[rank]],
+        dp_comm=comm,
+    )
+    collected_grad_w, collected_grad_b = request.wait()
+
+    assert collected_grad_w.dtype == input_w.dtype
+    assert collected_grad_b.dtype == input_b.dtype
+
+    np.testing.assert_allclose(
+        actual=collected_grad_w,
+        desired=np.array(
+            [
+                [96.0, 100.0, 104.0, 108.0, 112.0, 116.0, 120.0, 124.0],
+                [128.0, 132.0, 136.0, 140.0, 144.0, 148.0, 152.0, 156.0],
+            ]
+        ),
+    )
+    np.testing.assert_allclose(
+        actual=collected_grad_b,
+        desired=np.array([[48.0, 52.0, 56.0, 60.0, 64.0, 68.0, 72.0, 76.0]]),
+    )
+
+
+@pytest.mark.mpi
+def test_hierarchical_allreduce():
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+
+    # emulate nodes of two ranks each
+    local_comm = comm.Split(color=rank // 2, key=rank)
+    leader_comm = comm.Split(color=0 if rank % 2 == 0 else MPI.UNDEFINED, key=rank)
+
+    x = np.arange(8).astype(np.float64) * (rank + 1)
+    hierarchical_allreduce(x, local_comm, leader_comm)
+
+    np.testing.assert_allclose(actual=x, desired=np.arange(8).astype(np.float64) * 10)
+
+
+@pytest.mark.mpi
+def test_collect_weight_grad_hierarchical(monkeypatch):
+    monkeypatch.setattr(model.func_impl, "HIERARCHICAL_ALLREDUCE_MIN_DP_SIZE", 0)
+    monkeypatch.setattr(model.backend, "_node_groups", {})
+    # emulate nodes of two ranks each
+    monkeypatch.setattr(
+        Communicator,
+        "Split_type",
+        lambda self, split_type, key=0: Communicator(self.comm.Split(color=self.comm.Get_rank() // 2, key=key)),
+    )
+
+    world = MPI.COMM_WORLD
+    rank = world.Get_rank()
+    input_w = np.arange(64).reshape((8, 8)).astype(np.float64)
+    input_b = np.arange(32).reshape((4, 8)).astype(np.float64)
+
+    # two layers holding their own wrappers of the same data parallel group
+    dp_comms = [Communicator(world), Communicator(world)]
+    for dp_comm in dp_comms:
+        collected_grad_w, collected_grad_b = collect_weight_grad(
+            grad_w=input_w[rank * 2 : rank * 2 + 2],
+            grad_b=input_b[[rank]],
+            dp_comm=dp_comm,
+        )
+
+        np.testing.assert_allclose(actual=collected_grad_w, desired=input_w.reshape((4, 2, 8)).sum(axis=0))
+        np.testing.assert_allclose(actual=collected_grad_b, desired=input_b.sum(axis=0, keepdims=True))
+
+    # the node groups are built once for the underlying communicator
+    assert len(model.backend._node_groups) == 1
+
+    # intra-node Reduce + Bcast on every rank, plus the inter-node Allreduce on the leaders
+    nbytes = input_w[:2].nbytes + input_b[:1].nbytes
+    expected = 2 * nbytes + (2 * nbytes if rank % 2 == 0 else 0)
+    # the first layer also paid for counting the nodes
+    assert dp_comms[0].total_bytes_transferred == expected + 4 * 2 * 3
+    assert dp_comms[1].total_bytes_transferred == expected
+
+
+@pytest.mark.mpi
+def test_collect_weight_grad_bf16(monkeypatch):
+    monkeypatch.setattr(model.func_impl, "GRAD_ALLREDUCE_BF16", True)
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    input_w = np.arange(64).reshape((8, 8)).astype(np.float32)
+    input_b = np.arange(32).reshape((4, 8)).astype(np.float32)
+
+    collected_grad_w, collected_grad_b = collect_weight_grad(
+        grad_w=input_w[rank * 2 : rank * 2 + 2],
+        grad_b=input_b[[rank]],
+        dp_comm=comm,
+    )
+
+    assert collected_grad_w.dtype == np.float32
+    assert collected_grad_b.dtype == np.float32
+
+    # small integers are exact in bfloat16
+    np.testing.assert_allclose(
+        actual=collected_grad_w,
+        desired=np.array(
+            [
+                [96.0, 100.0, 104.0, 108.0, 112.0, 116.0, 120.0, 124.0],
+                [128.0, 132.0, 136.0, 140.0, 144.0, 148.0, 152.0, 156.0],
+            ]
+        ),
+    )
+    np.testing.assert_allclose(
+        actual=collected_grad_b,
+        desired=np.array([[48.0, 52.0, 56.0, 60.0, 64.0, 68.0, 72.0, 76.0]]),
+    )
+
+
+@pytest.mark.mpi
+def test_collect_weight_grad_results_are_independent():
+    comm = MPI.COMM_WORLD
+    size = comm.Get_size()
+
+    grad_w_1, grad_b_1 = collect_weight_grad(grad_w=np.ones((2, 2)), grad_b=np.ones((1, 2)), dp_comm=comm)
+    grad_w_2, grad_b_2 = collect_weight_grad(
+        grad_w=np.full((2, 2), 5.0), grad_b=np.full((1, 2), 5.0), dp_comm=comm
+    )
+
+    np.testing.assert_allclose(actual=grad_w_1, desired=np.full((2, 2), float(size)))
+    np.testing.assert_allclose(actual=grad_b_1, desired=np.full((1, 2), float(size)))
+    np.testing.assert_allclose(actual=grad_w_2, desired=np.full((2, 2), 5.0 * size))
+    np.testing.assert_allclose(actual=grad_b_2, desired=np.full((1, 2), 5.0 * size))
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from model.backend import NUMBA_PACK_MIN_SIZE, pack_column_blocks, unpack_column_blocks
+
+
+@pytest.mark.parametrize("batch_size", [4, NUMBA_PACK_MIN_SIZE // 16])
+def test_pack_unpack_column_blocks(batch_size):
+    mp_size, part_dim = 4, 4
+    src = np.arange(batch_size * mp_size * part_dim, dtype=np.float32).reshape(
+        (batch_size, mp_size * part_dim)
+    )
+
+    packed = np.empty((mp_size, batch_size, part_dim), dtype=np.float32)
+    pack_column_blocks(src, packed)
+
+    for r in range(mp_size):
+        np.testing.assert_array_equal(packed[r], src[:, r * part_dim : (r + 1) * part_dim])
+
+    unpacked = np.empty_like(src)
+    unpack_column_blocks(packed, unpacked)
+
+    np.testing.assert_array_equal(unpacked, src)
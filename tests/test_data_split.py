@@ -224,8 +224,27 @@ def test_mp_2_dp_4():
         )
 
 
+def test_split_returns_views():
+    x_train = np.arange(32, dtype=np.float32).reshape((16, 2))
+    y_train = np.arange(16, dtype=np.int32)
+
+    for rank in range(8):
+        x_train_ret, y_train_ret = split_data(
+            x_train=x_train,
+            y_train=y_train,
+            mp_size=2,
+            dp_size=4,
+            rank=rank,
+        )
+
+        assert np.shares_memory(x_train_ret, x_train)
+        assert np.shares_memory(y_train_ret, y_train)
+        assert x_train_ret.flags["C_CONTIGUOUS"]
+
+
 if __name__ == "__main__":
     test_mp_2_dp_1()
     test_mp_1_dp_2()
     test_mp_2_dp_2()
     test_mp_2_dp_4()
+    test_split_returns_views()
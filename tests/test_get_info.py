@@ -4,7 +4,7 @@ from mpi4py import MPI
 import numpy as np
 import pytest
 
-from model.func_impl import get_info
+from model.func_impl import get_info, init_parallel_groups
 
 
 def check_info(
@@ -281,3 +281,41 @@ def test_fc2_megatron():
         input_dict=input_dict,
         expect_output_dict=expect_output_dict,
     )
+
+
+@pytest.mark.mpi
+def test_parallel_groups_are_cached():
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+
+    info = dict(comm=comm, rank=rank, is_megatron_mp=False, in_dim=768, out_dim=256)
+    _, _, mp_comm, dp_comm, _, _ = get_info(mp_size=2, dp_size=4, is_fc1=True, **info)
+    # a second layer of the same topology reuses the communicators instead of splitting again
+    _, _, mp_comm_2, dp_comm_2, _, _ = get_info(mp_size=2, dp_size=4, is_fc1=False, **info)
+
+    assert mp_comm_2 is mp_comm
+    assert dp_comm_2 is dp_comm
+    mp_comm_2, dp_comm_2 = init_parallel_groups(comm=comm, rank=rank, mp_size=2, dp_size=4)
+    assert mp_comm_2 is mp_comm and dp_comm_2 is dp_comm
+
+    mp_comm_3, dp_comm_3 = init_parallel_groups(comm=comm, rank=rank, mp_size=4, dp_size=2)
+
+    assert mp_comm_3 is not mp_comm and dp_comm_3 is not dp_comm
+    assert mp_comm_3.Get_size() == 4
+    assert dp_comm_3.Get_size() == 2
+
+
+@pytest.mark.mpi
+def test_parallel_groups_follow_rank_layout():
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+
+    for mp_size, dp_size in [(2, 4), (4, 2)]:
+        mp_comm, dp_comm = init_parallel_groups(comm=comm, rank=rank, mp_size=mp_size, dp_size=dp_size)
+
+        # the ranks are not reordered, so group ranks are the row-major grid coordinates
+        assert mp_comm.Get_rank() == rank % mp_size
+        assert dp_comm.Get_rank() == rank // mp_size
+
+    with pytest.raises(AssertionError):
+        init_parallel_groups(comm=comm, rank=rank, mp_size=2, dp_size=2)
@@ -7,6 +7,7 @@ import pytest
 from model.func_impl import (
     megatron_collect_backward_output,
     megatron_collect_backward_x,
+    megatron_gather_backward_output,
 )
 
 
@@ -190,3 +191,19 @@ def test_fc2_megatron_mp_backward_x_2d():
     expect_output_dict = {"output_array": output_array_list[rank]}
 
     check_megatron_mp_backward_x(input_dict, expect_output_dict)
+
+
+@pytest.mark.mpi
+def test_fc2_megatron_mp_backward_output_sequence_parallel():
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    array = np.arange(16).reshape((8, 2)).astype(np.float32)
+
+    output = megatron_gather_backward_output(
+        output_grad=array[rank * 2 : rank * 2 + 2].copy(),
+        mp_comm=comm,
+        mp_size=4,
+    )
+
+    assert output.dtype == np.float32
+    np.testing.assert_allclose(actual=output, desired=array)
@@ -7,6 +7,7 @@ import pytest
 from model.func_impl import (
     megatron_collect_forward_input,
     megatron_collect_forward_output,
+    megatron_scatter_forward_output,
 )
 
 
@@ -122,3 +123,40 @@ def test_fc2_megatron_mp_forward_output_2d():
     expect_output_dict = {"output_array": np.array([[24.0, 28.0], [32.0, 36.0]])}
 
     check_megatron_mp_forward_output(input_dict, expect_output_dict)
+
+
+@pytest.mark.mpi
+def test_fc2_megatron_mp_forward_output_bias():
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    array = np.arange(16).reshape((8, 2)).astype(np.float64)
+    bias = np.array([[1.0, 2.0]]) * (rank + 1)
+
+    output = megatron_collect_forward_output(
+        out=array[rank * 2 : rank * 2 + 2],
+        mp_comm=comm,
+        mp_size=4,
+        bias=bias,
+    )
+
+    np.testing.assert_allclose(actual=output, desired=np.array([[34.0, 48.0], [42.0, 56.0]]))
+
+
+@pytest.mark.mpi
+def test_fc2_megatron_mp_forward_output_sequence_parallel():
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    array = np.arange(32).reshape((16, 2)).astype(np.float64)
+    bias = np.array([[1.0, 2.0]]) * (rank + 1)
+
+    output = megatron_scatter_forward_output(
+        out=array[rank * 4 : rank * 4 + 4].copy(),
+        mp_comm=comm,
+        mp_size=4,
+        bias=bias,
+    )
+
+    # rank r keeps row r of the summed (4, 2) outputs
+    desired = array.reshape((4, 4, 2)).sum(axis=0)[[rank]] + np.array([[10.0, 20.0]])
+    assert output.shape == (1, 2)
+    np.testing.assert_allclose(actual=output, desired=desired)
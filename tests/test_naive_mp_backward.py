@@ -4,6 +4,7 @@ from mpi4py import MPI
 import numpy as np
 import pytest
 
+import model.func_impl
 from model.func_impl import naive_collect_backward_output, naive_collect_backward_x
 
 
@@ -175,3 +176,63 @@ def test_fc2_naive_mp_backward_x_2d():
     expect_output_dict = {"output_array": output_array_list[rank]}
 
     check_naive_mp_backward_x(input_dict, expect_output_dict)
+
+
+@pytest.mark.mpi
+def test_fc2_naive_mp_backward_x_float32():
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    array = np.arange(64).reshape((8, 8)).astype(np.float32)
+
+    input_dict = {
+        "input_x": array[rank * 2 : rank * 2 + 2],
+        "mp_comm": comm,
+        "mp_size": 4,
+    }
+
+    output_array_list = {
+        0: np.array([[96.0, 100.0], [128.0, 132.0]], dtype=np.float32),
+        1: np.array([[104.0, 108.0], [136.0, 140.0]], dtype=np.float32),
+        2: np.array([[112.0, 116.0], [144.0, 148.0]], dtype=np.float32),
+        3: np.array([[120.0, 124.0], [152.0, 156.0]], dtype=np.float32),
+    }
+
+    expect_output_dict = {"output_array": output_array_list[rank]}
+
+    check_naive_mp_backward_x(input_dict, expect_output_dict)
+
+
+@pytest.mark.mpi
+def test_fc2_naive_mp_backward_x_reduce_scatter(monkeypatch):
+    # force the reduce-scatter path that is otherwise only taken for larger mp groups
+    monkeypatch.setattr(model.func_impl, "ALLREDUCE_SLICE_MAX_MP_SIZE", 0)
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    array = np.arange(64).reshape((8, 8)).astype(np.float64)
+
+    input_dict = {
+        "input_x": array[rank * 2 : rank * 2 + 2],
+        "mp_comm": comm,
+        "mp_size": 4,
+    }
+
+    output_array_list = {
+        0: np.array([[96.0, 100.0], [128.0, 132.0]]),
+        1: np.array([[104.0, 108.0], [136.0, 140.0]]),
+        2: np.array([[112.0, 116.0], [144.0, 148.0]]),
+        3: np.array([[120.0, 124.0], [152.0, 156.0]]),
+    }
+
+    expect_output_dict = {"output_array": output_array_list[rank]}
+
+    check_naive_mp_backward_x(input_dict, expect_output_dict)
+
+
+@pytest.mark.mpi
+def test_fc2_naive_mp_backward_x_non_contiguous():
+    comm = MPI.COMM_WORLD
+    array = np.asfortranarray(np.arange(16).reshape((2, 8)).astype(np.float32))
+
+    with pytest.raises(AssertionError):
+        naive_collect_backward_x(grad_x=array, mp_comm=comm, mp_size=4)
@@ -4,7 +4,13 @@ from mpi4py import MPI
 import numpy as np
 import pytest
 
-from model.func_impl import naive_collect_forward_input, naive_collect_forward_output
+from model.func_impl import (
+    BatchedCollector,
+    naive_collect_forward_input,
+    naive_collect_forward_output,
+    naive_finish_collect_forward_input,
+    naive_start_collect_forward_input,
+)
 
 
 def check_naive_mp_forward_x(
@@ -171,3 +177,108 @@ def test_fc2_naive_mp_forward_output_2d():
     }
 
     check_naive_mp_forward_output(input_dict, expect_output_dict)
+
+
+@pytest.mark.mpi
+def test_fc2_naive_mp_forward_x_nonblocking():
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    array = np.arange(16).reshape((8, 2)).astype(np.float64)
+    x = array[rank * 2 : rank * 2 + 2]
+
+    recv_buf, request = naive_start_collect_forward_input(x=x, mp_comm=comm, mp_size=4)
+    output = naive_finish_collect_forward_input(recv_buf=recv_buf, request=request)
+
+    assert x.dtype == output.dtype
+
+    np.testing.assert_allclose(
+        actual=output,
+        desired=np.array(
+            [
+                [0.0, 1.0, 4.0, 5.0, 8.0, 9.0, 12.0, 13.0],
+                [2.0, 3.0, 6.0, 7.0, 10.0, 11.0, 14.0, 15.0],
+            ]
+        ),
+    )
+
+
+@pytest.mark.mpi
+def test_fc2_naive_mp_forward_x_nonblocking_overlapping():
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    array = np.arange(16).reshape((2, 8)).astype(np.float64)
+    x_a = array[:, rank * 2 : rank * 2 + 2].copy()
+    x_b = x_a + 100
+
+    # e.g. the next micro-batch's gather is started before the current one completes
+    recv_buf_a, request_a = naive_start_collect_forward_input(x=x_a, mp_comm=comm, mp_size=4)
+    recv_buf_b, request_b = naive_start_collect_forward_input(x=x_b, mp_comm=comm, mp_size=4)
+    output_a = naive_finish_collect_forward_input(recv_buf=recv_buf_a, request=request_a)
+    output_b = naive_finish_collect_forward_input(recv_buf=recv_buf_b, request=request_b)
+
+    np.testing.assert_allclose(actual=output_a, desired=array)
+    np.testing.assert_allclose(actual=output_b, desired=array + 100)
+
+    # a later gather must not overwrite results that were already handed out
+    recv_buf, request = naive_start_collect_forward_input(x=x_a * 0, mp_comm=comm, mp_size=4)
+    naive_finish_collect_forward_input(recv_buf=recv_buf, request=request)
+
+    np.testing.assert_allclose(actual=output_a, desired=array)
+    np.testing.assert_allclose(actual=output_b, desired=array + 100)
+
+
+@pytest.mark.mpi
+def test_fc2_naive_mp_forward_x_batched():
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    micro_batches = [np.arange(16).reshape((2, 8)).astype(np.float64) * (i + 1) for i in range(3)]
+
+    collector = BatchedCollector(mp_comm=comm, mp_size=4, num_micro_batches=2)
+
+    assert collector.add(micro_batches[0][:, rank * 2 : rank * 2 + 2]) is None
+    outputs = collector.add(micro_batches[1][:, rank * 2 : rank * 2 + 2])
+    assert len(outputs) == 2
+    for output, desired in zip(outputs, micro_batches[:2]):
+        np.testing.assert_allclose(actual=output, desired=desired)
+
+    # a partial flush gathers whatever is queued
+    assert collector.add(micro_batches[2][:, rank * 2 : rank * 2 + 2]) is None
+    outputs = collector.flush()
+    assert len(outputs) == 1
+    np.testing.assert_allclose(actual=outputs[0], desired=micro_batches[2])
+    assert collector.flush() == []
+
+
+@pytest.mark.mpi
+def test_fc2_naive_mp_forward_x_batched_interleaved():
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    micro_batches = [np.arange(16).reshape((2, 8)).astype(np.float64) * (i + 1) for i in range(4)]
+
+    # e.g. one collector per layer: collectors of the same shape must not share buffers
+    collector_a = BatchedCollector(mp_comm=comm, mp_size=4, num_micro_batches=2)
+    collector_b = BatchedCollector(mp_comm=comm, mp_size=4, num_micro_batches=2)
+
+    assert collector_a.add(micro_batches[0][:, rank * 2 : rank * 2 + 2]) is None
+    assert collector_b.add(micro_batches[1][:, rank * 2 : rank * 2 + 2]) is None
+    outputs_a = collector_a.add(micro_batches[2][:, rank * 2 : rank * 2 + 2])
+    outputs_b = collector_b.add(micro_batches[3][:, rank * 2 : rank * 2 + 2])
+
+    np.testing.assert_allclose(actual=outputs_a[0], desired=micro_batches[0])
+    np.testing.assert_allclose(actual=outputs_a[1], desired=micro_batches[2])
+    np.testing.assert_allclose(actual=outputs_b[0], desired=micro_batches[1])
+    np.testing.assert_allclose(actual=outputs_b[1], desired=micro_batches[3])
+
+
+@pytest.mark.mpi
+def test_fc2_naive_mp_forward_x_results_are_independent():
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    array = np.arange(16).reshape((2, 8)).astype(np.float64)
+
+    # e.g. two layers of the same shape: the first result is still needed for its backward
+    output_1 = naive_collect_forward_input(x=array[:, rank * 2 : rank * 2 + 2].copy(), mp_comm=comm, mp_size=4)
+    output_2 = naive_collect_forward_input(x=array[:, rank * 2 : rank * 2 + 2] * 10, mp_comm=comm, mp_size=4)
+
+    np.testing.assert_allclose(actual=output_1, desired=array)
+    np.testing.assert_allclose(actual=output_2, desired=array * 10)
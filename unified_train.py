@@ -16,6 +16,11 @@ parser.add_argument(
     action="store_true",
     help="Use this flag to enable Megatron-style model parallelism",
 )
+parser.add_argument(
+    "--sequence-parallel",
+    action="store_true",
+    help="Use this flag to reduce-scatter the Megatron-style fc2 output and compute the loss on batch shards",
+)
 
 from model.MLP import MLPModel
 
@@ -52,6 +57,8 @@ def train_mlp(
             model.update_weights(lr=lr)
             iter_num += 1
 
+            if (iter_num + 1) % 10 == 0:
+                loss, acc = model.reduce_metrics([loss, acc])
             if (iter_num + 1) % 10 == 0 and rank == 0:
                 print(
                     f"Epoch:{epoch+1} iter_num:{i}/{num_examples}: Train Loss: {loss}, Train Acc: {acc}, lr_rate: {lr}"
@@ -80,6 +87,7 @@ def train_mlp(
                 _, acc = model.forward(x_batch, y_batch)
                 eval_acc += acc * x_batch.shape[0]
 
+            eval_acc = model.reduce_metrics([eval_acc])[0]
             if rank % model.mp_size == 0:
                 print(f"Test Acc: {eval_acc / x_test.shape[0]}")
                 print("*" * 90)
@@ -103,6 +111,9 @@ if __name__ == "__main__":
     dp_size = args.dp_size
     mp_size = args.mp_size
     megatron_mp = args.megatron_mp
+    sequence_parallel = args.sequence_parallel
+    if sequence_parallel and not megatron_mp:
+        parser.error("--sequence-parallel requires --megatron-mp")
 
     if rank == 0:
         log_args(
@@ -120,6 +131,7 @@ if __name__ == "__main__":
         dp_size=dp_size,
         mp_size=mp_size,
         megatron_mp=megatron_mp,
+        sequence_parallel=sequence_parallel,
         feature_dim=784,
         hidden_dim=256,
         output_dim=10,
@@ -129,17 +141,18 @@ if __name__ == "__main__":
 
     MNIST_data = h5py.File("./data/MNISTdata.hdf5", "r")
 
-    x_train = np.float32(MNIST_data["x_train"])
-    y_train = np.int32(np.array(MNIST_data["y_train"][:, 0]))
-
+    # split the h5py datasets before materializing them so every rank only reads its own chunk
     x_train, y_train = split_data(
-        x_train=x_train,
-        y_train=y_train,
+        x_train=MNIST_data["x_train"],
+        y_train=MNIST_data["y_train"],
         mp_size=mp_size,
         dp_size=dp_size,
         rank=rank,
     )
 
+    x_train = np.float32(x_train)
+    y_train = np.int32(np.array(y_train[:, 0]))
+
     x_test = np.float32(MNIST_data["x_test"][:])
     y_test = np.int32(np.array(MNIST_data["y_test"][:, 0]))
     MNIST_data.close()